@@ -17,20 +17,31 @@ Usage:
     python agent.py --listen
 """
 
+import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import dspy
 
-from config import LLM_ENDPOINT, LLM_MODEL, REDIS_HOST
+from config import (
+    LLM_ENDPOINT, LLM_MODEL, LLM_CONCURRENCY, COMPILED_EXTRACTOR_PATH,
+    LISTEN_WORKERS, LOG_LEVEL, REDIS_HOST,
+)
 from extract_text import extract_text
 from chunker import chunk_text
-from extractor import extract_from_chunk
-from storage import get_redis_client, store_extraction, flush_triples, get_all_triples
+from extractor import batch_extract, load_compiled_extractor
+from storage import get_redis_client, store_extractions, flush_triples, get_all_triples
+
+logger = logging.getLogger(__name__)
 
 
 def setup_llm():
     """Configure DSPy with the LLM endpoint."""
+    # Only the pipeline's own loggers follow LOG_LEVEL, libraries stay at WARNING
+    logging.basicConfig(format="    %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("extractor").setLevel(LOG_LEVEL)
+    
     print(f"Configuring LLM: {LLM_MODEL}")
     print(f"Endpoint: {LLM_ENDPOINT}")
     
@@ -44,6 +55,12 @@ def setup_llm():
     print("LLM configured\n")
 
 
+def setup_extractor():
+    """Load the compiled extractor from compile_extractor.py, if one has been saved."""
+    if load_compiled_extractor(COMPILED_EXTRACTOR_PATH):
+        print(f"Loaded compiled extractor: {COMPILED_EXTRACTOR_PATH.name}\n")
+
+
 def process_document(file_path: str, r) -> dict:
     """
     Full pipeline for processing one document.
@@ -65,38 +82,27 @@ def process_document(file_path: str, r) -> dict:
     text = extract_text(file_path)
     print(f"Extracted {len(text):,} characters")
     
-    # 2. Chunk
+    # 2. Chunk (lazily, chunks are produced as the extractor consumes them)
     print("\n[2/4] Chunking...")
     chunks = chunk_text(text)
-    print(f"Created {len(chunks)} chunks")
     
     # 3. Extract entities and triples
     print("\n[3/4] Extracting entities and triples...")
-    total_entities = 0
-    total_triples = 0
+    print(f"  Sending chunks to the LLM ({LLM_CONCURRENCY} at a time)...")
+    results = batch_extract(chunks, source=file_path.name, num_threads=LLM_CONCURRENCY)
+    print(f"  Processed {len(results)} chunks")
     
-    for i, chunk in enumerate(chunks):
-        print(f"  Processing chunk {i+1}/{len(chunks)}...", end=" ")
-        
-        extraction = extract_from_chunk(
-            text=chunk,
-            chunk_id=i,
-            source=file_path.name
-        )
-        
-        # 4. Store
-        stored = store_extraction(r, extraction)
-        
-        total_entities += len(extraction.entities)
-        total_triples += len(extraction.triples)
-        
-        print(f"entities: {len(extraction.entities)}, triples: {len(extraction.triples)}")
+    for extraction in results:
+        print(f"  Chunk {extraction.chunk_id+1}/{len(results)}: entities: {len(extraction.entities)}, triples: {len(extraction.triples)}")
+    
+    # 4. Store the whole document's unique rows in one pipelined write
+    total_triples, total_entities = store_extractions(r, results)
     
-    print(f"\n[4/4] Storage complete")
+    print(f"\n[4/4] Storage complete ({total_triples} unique triples, {total_entities} unique entities)")
     
     stats = {
         "file": file_path.name,
-        "chunks": len(chunks),
+        "chunks": len(results),
         "entities": total_entities,
         "triples": total_triples,
     }
@@ -104,10 +110,35 @@ def process_document(file_path: str, r) -> dict:
     return stats
 
 
+def _process_message(file_path: str, r):
+    """Process one document received in listener mode and publish the outcome."""
+    print(f"\nReceived: {file_path}")
+    
+    try:
+        stats = process_document(file_path, r)
+        r.publish("processing_complete", f"{file_path}|success|{stats['triples']} triples")
+        print(f"✓ Published completion for {file_path}")
+    except Exception as e:
+        r.publish("processing_complete", f"{file_path}|error|{str(e)}")
+        print(f"Error processing {file_path}: {e}")
+
+
+def _log_failure(future):
+    """Done-callback that logs anything _process_message itself failed to handle."""
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Listener worker failed", exc_info=exc)
+
+
 def listen_mode(r):
     """
     Run in pub/sub listener mode for continuous document processing.
     
+    A single subscriber hands each received document to a thread pool, so
+    a slow document doesn't hold up the ones queued behind it.
+    
     Listens on channel: documents_to_process
     Publishes completion to: processing_complete
     """
@@ -116,23 +147,25 @@ def listen_mode(r):
     print("="*60)
     print(f"Redis: {REDIS_HOST}")
     print("Subscribing to channel: documents_to_process")
+    print(f"Processing up to {LISTEN_WORKERS} documents at once")
     print("Press Ctrl+C to stop\n")
     
-    pubsub = r.pubsub()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
     pubsub.subscribe("documents_to_process")
     
-    for message in pubsub.listen():
-        if message['type'] == 'message':
-            file_path = message['data']
-            print(f"\nReceived: {file_path}")
-            
-            try:
-                stats = process_document(file_path, r)
-                r.publish("processing_complete", f"{file_path}|success|{stats['triples']} triples")
-                print(f"✓ Published completion for {file_path}")
-            except Exception as e:
-                r.publish("processing_complete", f"{file_path}|error|{str(e)}")
-                print(f"Error processing {file_path}: {e}")
+    executor = ThreadPoolExecutor(max_workers=LISTEN_WORKERS)
+    try:
+        while True:
+            message = pubsub.get_message(timeout=1.0)
+            if message and message['type'] == 'message':
+                future = executor.submit(_process_message, message['data'], r)
+                future.add_done_callback(_log_failure)
+    except KeyboardInterrupt:
+        print("\nStopping listener, dropping queued documents...")
+    finally:
+        pubsub.close()
+        # Don't wait for the queue to drain, only in-flight documents finish
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def show_stats(r):
@@ -179,6 +212,7 @@ def main():
     
     # Setup
     setup_llm()
+    setup_extractor()
     r = get_redis_client()
     
     # Handle flush
@@ -2,33 +2,50 @@
 Splits large documents into smaller chunks for LLM processing.
 """
 
+import re
+from collections import deque
+from collections.abc import Iterator
+
 from config import CHUNK_SIZE, CHUNK_OVERLAP
 
+_WORD_RE = re.compile(r"\S+")
+
 
 def chunk_text(
     text: str,
     chunk_size: int = CHUNK_SIZE,
     overlap: int = CHUNK_OVERLAP
-) -> list[str]:
+) -> Iterator[str]:
     """
-    Returns -> list[str]: List of text chunks.
-    """
-    words = text.split()
-    chunks = []
-    
-    if len(words) <= chunk_size:
-        return [text]
+    Yields -> str: Text chunks, in document order.
     
+    Each chunk is a single slice of the original text, from the start of its
+    first word to the end of its last word, so original whitespace is kept.
+    Words are scanned lazily, so only one chunk's word offsets are held at a time.
+    """
     step = chunk_size - overlap
     
-    #iterate through the words to create a chunk and add to the list of chunks
-    for i in range(0, len(words), step):
-        chunk = " ".join(words[i:i + chunk_size])
-        if chunk:
-            chunks.append(chunk)
+    # (start, end) character offsets of the words in the current chunk
+    window = deque()
+    new_words = 0
+    emitted = False
+    
+    #walk the words, yielding a chunk each time the window is full
+    for match in _WORD_RE.finditer(text):
+        window.append(match.span())
+        new_words += 1
         
-        # Stop if we've captured all words
-        if i + chunk_size >= len(words):
-            break
-    #list of chunks 
-    return chunks
+        if len(window) == chunk_size:
+            yield text[window[0][0]:window[-1][1]]
+            emitted = True
+            new_words = 0
+            # Keep the last `overlap` words for the next chunk
+            for _ in range(step):
+                window.popleft()
+    
+    if not emitted:
+        # Short document: a single chunk
+        yield text
+    elif new_words:
+        # Words left over after the last full chunk
+        yield text[window[0][0]:window[-1][1]]
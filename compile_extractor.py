@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Extractor Compiler
+
+Compiles the DSPy extractor ahead of time with BootstrapFewShot, using chunks
+of the given documents as the training set. The bootstrapped demos are saved
+to COMPILED_EXTRACTOR_PATH, which agent.py loads at startup.
+
+Usage:
+    # Compile against the sample OPORD
+    python compile_extractor.py
+
+    # Compile against specific documents
+    python compile_extractor.py doc1.txt doc2.pdf
+"""
+
+import sys
+from pathlib import Path
+
+import dspy
+
+from agent import setup_llm
+from chunker import chunk_text
+from config import COMPILED_EXTRACTOR_PATH
+from extract_text import extract_text
+from extractor import ExtractTriples, triple_valid_metric
+
+DEFAULT_DOCUMENTS = ["sample_opord.txt"]
+
+# Upper bound on few-shot demos baked into the compiled prompt
+MAX_DEMOS = 4
+
+
+def build_trainset(file_paths: list[str]) -> list[dspy.Example]:
+    """Chunk each document and wrap every chunk as an unlabeled example."""
+    trainset = []
+    for file_path in file_paths:
+        text = extract_text(file_path)
+        for chunk in chunk_text(text):
+            trainset.append(dspy.Example(text=chunk).with_inputs("text"))
+    return trainset
+
+
+def main():
+    """Main entry point."""
+    args = sys.argv[1:]
+
+    if "-h" in args or "--help" in args:
+        print(__doc__)
+        sys.exit(0)
+
+    file_paths = args or DEFAULT_DOCUMENTS
+    missing = [f for f in file_paths if not Path(f).exists()]
+    if missing:
+        print(f"✗ File not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    setup_llm()
+
+    trainset = build_trainset(file_paths)
+    print(f"Training on {len(trainset)} chunks from {len(file_paths)} documents")
+
+    optimizer = dspy.BootstrapFewShot(
+        metric=triple_valid_metric,
+        max_bootstrapped_demos=MAX_DEMOS,
+        max_labeled_demos=0,
+    )
+    compiled = optimizer.compile(dspy.ChainOfThought(ExtractTriples), trainset=trainset)
+
+    compiled.save(str(COMPILED_EXTRACTOR_PATH))
+    print(f"✓ Saved compiled extractor to {COMPILED_EXTRACTOR_PATH}")
+
+
+if __name__ == "__main__":
+    main()
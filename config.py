@@ -2,6 +2,8 @@
 Configuration settings for the ingestion pipeline.
 """
 
+from pathlib import Path
+
 # Toggle between local and Ares server
 USE_LOCAL_REDIS = True
 
@@ -17,10 +19,30 @@ ARES_REDIS_PORT = 6379
 REDIS_HOST = LOCAL_REDIS_HOST if USE_LOCAL_REDIS else ARES_REDIS_HOST
 REDIS_PORT = LOCAL_REDIS_PORT if USE_LOCAL_REDIS else ARES_REDIS_PORT
 
+# Upper bound on open connections shared by all pipeline threads
+REDIS_MAX_CONNECTIONS = 32
+
 # LLM Settings
 
 LLM_ENDPOINT = "http://ares.westpoint.edu:11435/v1"
 LLM_MODEL = "openai/gemma3"
+LLM_CONCURRENCY = 8  # chunks sent to the LLM endpoint at once
+COMPILED_EXTRACTOR_PATH = Path(__file__).parent / "extractor.json"  # written by compile_extractor.py
+
+
+# Text Extraction Settings
+
+TEXT_CACHE_DIR = Path.home() / ".cache" / "ner_test"  # set to None to disable
+
+
+# Listener Settings
+
+LISTEN_WORKERS = 4  # documents processed at once in --listen mode
+
+
+# Logging Settings
+
+LOG_LEVEL = "INFO"  # pipeline log level, "DEBUG" logs raw LLM output per chunk
 
 
 # Chunking Settings
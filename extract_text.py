@@ -6,8 +6,15 @@ For now, supports .txt and .pdf files.
 Docling can be added later for more advanced extraction.
 """
 
+import hashlib
+import tempfile
 from pathlib import Path
 
+from config import TEXT_CACHE_DIR
+
+# Formats whose extraction is expensive enough to cache on disk
+_CACHED_SUFFIXES = {".pdf"}
+
 
 def extract_text(file_path: str | Path) -> str:
     """
@@ -17,6 +24,9 @@ def extract_text(file_path: str | Path) -> str:
     - .txt files (direct read)
     - .pdf files (using PyMuPDF/fitz)
     
+    PDF results are cached in TEXT_CACHE_DIR, keyed by a hash of the file
+    contents, so re-ingesting an unchanged PDF skips PyMuPDF entirely.
+    
     Args:
         file_path: Path to the document.
         
@@ -27,37 +37,85 @@ def extract_text(file_path: str | Path) -> str:
     suffix = file_path.suffix.lower()
     
     if suffix == ".txt":
-        return _extract_from_txt(file_path)
+        extract = _extract_from_txt
     elif suffix == ".pdf":
-        return _extract_from_pdf(file_path)
+        extract = _extract_from_pdf
     else:
         raise ValueError(f"Unsupported file type: {suffix}")
+    
+    if suffix in _CACHED_SUFFIXES:
+        return _cached(file_path, extract)
+    return extract(file_path)
+
+
+def _cached(file_path: Path, extract) -> str:
+    """Return cached text for this file's contents, or run `extract` and cache it."""
+    if TEXT_CACHE_DIR is None:
+        return extract(file_path)
+    
+    digest = hashlib.blake2b(file_path.read_bytes(), digest_size=16).hexdigest()
+    # Suffix is part of the key so different formats never share an entry
+    cache_file = Path(TEXT_CACHE_DIR) / f"{digest}{file_path.suffix.lower()}.txt"
+    
+    # newline="" everywhere so a hit returns exactly what `extract` produced
+    try:
+        with cache_file.open(encoding="utf-8", newline="") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"  Ignoring unreadable text cache entry {cache_file.name}: {e}")
+    
+    text = extract(file_path)
+    
+    # The cache is best-effort, a failed write must not fail the document
+    tmp_path = None
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp file per writer, then rename so readers never see a partial entry
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", newline="", dir=cache_file.parent, suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = Path(tmp.name)
+            tmp.write(text)
+        tmp_path.replace(cache_file)
+    except OSError as e:
+        print(f"  Could not write text cache entry {cache_file.name}: {e}")
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    
+    return text
 
 
 def _extract_from_txt(file_path: Path) -> str:
     """Extract text from a .txt file, handling various encodings."""
+    # Read once, then try decoding the bytes in memory
+    raw = file_path.read_bytes()
+    
     # Try common encodings in order
     encodings = ['utf-8', 'cp1252', 'latin-1', 'iso-8859-1']
     
     for encoding in encodings:
         try:
-            with open(file_path, "r", encoding=encoding) as f:
-                return f.read()
+            return _normalize_newlines(raw.decode(encoding))
         except UnicodeDecodeError:
             continue
     
-    # Fallback: read with errors ignored
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
+    # Fallback: decode with errors ignored
+    return _normalize_newlines(raw.decode("utf-8", errors="ignore"))
+
+
+def _normalize_newlines(text: str) -> str:
+    """Convert CRLF and CR line endings to LF, as text-mode open() did."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
 
 def _extract_from_pdf(file_path: Path) -> str:
     """Extract text from a PDF using PyMuPDF."""
     import fitz
     
-    text = ""
+    parts = []
     with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text()
+        parts.extend(page.get_text() for page in doc)
     
-    return text
\ No newline at end of file
+    return "".join(parts)
\ No newline at end of file
@@ -5,11 +5,32 @@ Uses an LLM to extract entities and triples from text chunks.
 """
 
 import json
+import logging
 import re
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
 import dspy
+from pydantic import TypeAdapter, ValidationError
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser
+    orjson = None
 
+from config import LLM_CONCURRENCY
 from models import Entity, Triple, ExtractionResult
 
+logger = logging.getLogger(__name__)
+
+# Validate whole lists in one call into pydantic-core
+_ENTITIES_ADAPTER = TypeAdapter(list[Entity])
+_TRIPLES_ADAPTER = TypeAdapter(list[Triple])
+
+# Fields a raw triple must have to be kept
+_TRIPLE_KEYS = {"subject", "predicate", "object"}
+
 
 class ExtractTriples(dspy.Signature):
     """Extract entities and relationships from military text."""
@@ -19,6 +40,24 @@ class ExtractTriples(dspy.Signature):
     triples: str = dspy.OutputField(desc="JSON list of {subject: {name, type}, predicate, object: {name, type}} objects")
 
 
+@lru_cache(maxsize=1)
+def _get_extractor() -> dspy.ChainOfThought:
+    """Build the extractor module on first use and reuse it for every chunk."""
+    return dspy.ChainOfThought(ExtractTriples)
+
+
+def _json_loads(text: str):
+    """
+    Parse a JSON string, using orjson when it is installed.
+    
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    catch the stdlib error either way.
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
 def clean_json_response(text: str) -> str:
     """
     Remove markdown code blocks and other formatting from LLM JSON responses.
@@ -59,6 +98,64 @@ def clean_json_response(text: str) -> str:
     return cleaned
 
 
+def load_compiled_extractor(path: str | Path) -> bool:
+    """
+    Load a compiled extractor (few-shot demos) saved by compile_extractor.py.
+    
+    Args:
+        path: Path to the saved program state.
+        
+    Returns:
+        bool: True if the file existed and was loaded.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    
+    _get_extractor().load(str(path))
+    return True
+
+
+def _parse_json_field(raw: str):
+    """
+    Parse an LLM JSON field, cleaning it only if it doesn't parse as-is.
+    
+    Well-behaved responses skip clean_json_response entirely.
+    """
+    if not raw:
+        return []
+    
+    try:
+        return _json_loads(raw)
+    except json.JSONDecodeError:
+        return _json_loads(clean_json_response(raw))
+
+
+def triple_valid_metric(example, pred, trace=None) -> bool:
+    """
+    DSPy metric used by compile_extractor.py.
+    
+    A prediction is a good demo if it parses into at least one valid triple.
+    """
+    extraction = _parse_prediction(pred, chunk_id=0, source="compile")
+    return bool(extraction.triples)
+
+
+def _is_too_short(text: str) -> bool:
+    """Return True for empty or very short chunks that aren't worth an LLM call."""
+    return not text or len(text.strip()) < 20
+
+
+def _empty_result(chunk_id: int, source: str) -> ExtractionResult:
+    """Build an ExtractionResult with no entities or triples."""
+    return ExtractionResult(
+        source_file=source,
+        chunk_id=chunk_id,
+        entities=[],
+        triples=[]
+    )
+
+
 def extract_from_chunk(text: str, chunk_id: int, source: str) -> ExtractionResult:
     """
     Extract entities and triples from a text chunk using LLM.
@@ -72,86 +169,168 @@ def extract_from_chunk(text: str, chunk_id: int, source: str) -> ExtractionResul
         ExtractionResult: Validated extraction containing entities and triples.
     """
     # Skip empty or very short chunks
-    if not text or len(text.strip()) < 20:
+    if _is_too_short(text):
         print(f"  Chunk {chunk_id} is too short, skipping")
-        return ExtractionResult(
-            source_file=source,
-            chunk_id=chunk_id,
-            entities=[],
-            triples=[]
-        )
+        return _empty_result(chunk_id, source)
     
-    extractor = dspy.ChainOfThought(ExtractTriples)
+    result = _get_extractor()(text=text)
+    return _parse_prediction(result, chunk_id, source)
+
+
+def batch_extract(
+    chunks: Iterable[str],
+    source: str,
+    num_threads: int = LLM_CONCURRENCY
+) -> list[ExtractionResult]:
+    """
+    Extract entities and triples from many chunks concurrently.
     
-    try:
-        result = extractor(text=text)
-        
-        # Clean markdown formatting from responses
-        entities_json = clean_json_response(result.entities)
-        triples_json = clean_json_response(result.triples)
-        
-        # Debug: show if cleaning was needed
-        if '```' in result.entities or '```' in result.triples:
-            print(f"  (cleaned markdown from response)")
-        
-        # Parse entities
-        entities_raw = json.loads(entities_json)
-        print(f"    DEBUG entities_raw: {entities_raw}")
-        entities = [Entity(**e) for e in entities_raw]
-        
-        # Parse triples
-        triples_raw = json.loads(triples_json)
-        print(f"    DEBUG triples_raw: {triples_raw}")
-        triples = []
-        for t in triples_raw:
-            try:
-                # Handle subject - could be dict or string
-                if isinstance(t["subject"], dict):
-                    subject = Entity(**t["subject"])
-                else:
-                    subject = Entity(name=str(t["subject"]), type="UNKNOWN")
-                
-                # Handle object - could be dict or string
-                if isinstance(t["object"], dict):
-                    obj = Entity(**t["object"])
-                else:
-                    obj = Entity(name=str(t["object"]), type="UNKNOWN")
-                
-                triple = Triple(
-                    subject=subject,
-                    predicate=t["predicate"],
-                    object=obj,
-                    confidence=t.get("confidence", 1.0)
-                )
-                triples.append(triple)
-            except (KeyError, TypeError) as e:
-                print(f"    Skipping malformed triple: {t} - {e}")
-                continue
+    Runs the extractor over all chunks with DSPy's batch facility so
+    several LLM requests are in flight at once.
+    
+    Args:
+        chunks: Text chunks of one document, in order. May be a generator.
+        source: Source filename for provenance.
+        num_threads: Number of concurrent LLM requests.
         
-        return ExtractionResult(
-            source_file=source,
-            chunk_id=chunk_id,
-            entities=entities,
-            triples=triples
-        )
+    Returns:
+        list[ExtractionResult]: One result per chunk, where result i is for chunk i.
+    """
+    results = []
+    
+    # Only send chunks with enough text to the LLM
+    chunk_ids = []
+    examples = []
+    for i, chunk in enumerate(chunks):
+        results.append(_empty_result(i, source))
+        if _is_too_short(chunk):
+            print(f"  Chunk {i} is too short, skipping")
+            continue
+        chunk_ids.append(i)
+        examples.append(dspy.Example(text=chunk).with_inputs("text"))
+    
+    if not examples:
+        return results
+    
+    # Per-chunk summary lines already report progress, so no tqdm bar
+    predictions = _get_extractor().batch(
+        examples,
+        num_threads=num_threads,
+        disable_progress_bar=True
+    )
+    
+    for chunk_id, prediction in zip(chunk_ids, predictions):
+        # Failed LLM calls come back as None
+        if prediction is None:
+            print(f"    LLM call failed for chunk {chunk_id}")
+            continue
+        results[chunk_id] = _parse_prediction(prediction, chunk_id, source)
+    
+    return results
+
+
+def _as_entity(value) -> dict:
+    """Subject/object may be a {name, type} dict or a bare string."""
+    if isinstance(value, dict):
+        return value
+    return {"name": str(value), "type": "UNKNOWN"}
+
+
+def _normalize_triples(triples_raw: list) -> list[dict]:
+    """Normalize raw triples in one pass, skipping items missing a required field."""
+    if not isinstance(triples_raw, list):
+        raise TypeError(f"expected a JSON list, got {type(triples_raw).__name__}")
+    
+    triples_norm = [
+        {
+            "subject": _as_entity(t["subject"]),
+            "predicate": t["predicate"],
+            "object": _as_entity(t["object"]),
+            "confidence": t.get("confidence", 1.0),
+        }
+        for t in triples_raw
+        if isinstance(t, dict) and _TRIPLE_KEYS <= t.keys()
+    ]
+    if len(triples_norm) < len(triples_raw):
+        print(f"    Skipping {len(triples_raw) - len(triples_norm)} malformed triples")
+    return triples_norm
+
+
+def _validate_list(adapter: TypeAdapter, items: list, label: str, chunk_id: int) -> list:
+    """
+    Validate a whole list in one call, dropping invalid items if that fails.
+    
+    The happy path is a single validate_python call. On ValidationError the
+    failing indices are removed and the rest is validated again.
+    """
+    try:
+        return adapter.validate_python(items)
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err["loc"] and isinstance(err["loc"][0], int)}
+        # Not an item-level failure (e.g. not a list at all)
+        if not bad:
+            raise
+        print(f"    Skipping {len(bad)} invalid {label} in chunk {chunk_id}")
+        return adapter.validate_python([item for i, item in enumerate(items) if i not in bad])
+
+
+def _parse_list_field(
+    raw: str,
+    label: str,
+    adapter: TypeAdapter,
+    chunk_id: int,
+    normalize=None
+) -> list:
+    """
+    Parse and validate one JSON list field of a prediction.
+    
+    Returns:
+        list: Validated items, or an empty list if the field can't be parsed.
+    """
+    # Shown in the error handlers if parsing fails before this is set
+    parsed = "N/A"
+    
+    try:
+        # Markdown is cleaned only if needed
+        parsed = _parse_json_field(raw)
+        logger.debug("%s_raw: %r", label, parsed)
+        if normalize is not None:
+            parsed = normalize(parsed)
+        return _validate_list(adapter, parsed, label, chunk_id)
         
     except json.JSONDecodeError as e:
-        print(f"    JSON parse error for chunk {chunk_id}: {e}")
-        print(f"    Cleaned entities: {entities_json[:200] if 'entities_json' in dir() else 'N/A'}...")
-        print(f"    Cleaned triples: {triples_json[:200] if 'triples_json' in dir() else 'N/A'}...")
-        return ExtractionResult(
-            source_file=source,
-            chunk_id=chunk_id,
-            entities=[],
-            triples=[]
-        )
-    except (KeyError, TypeError) as e:
-        print(f"    Data structure error for chunk {chunk_id}: {e}")
-        print(f"    Parsed entities structure: {entities_raw[:3] if 'entities_raw' in dir() else 'N/A'}")
-        print(f"    Parsed triples structure: {triples_raw[:1] if 'triples_raw' in dir() else 'N/A'}")
-        return ExtractionResult(
-            source_file=source,
-            chunk_id=chunk_id,
-            entities=[],
-            triples=[]
-        )
\ No newline at end of file
+        print(f"    JSON parse error for chunk {chunk_id} {label}: {e}")
+        logger.debug("Raw %s: %.200s...", label, raw)
+        return []
+    except (KeyError, TypeError, ValidationError) as e:
+        print(f"    Data structure error for chunk {chunk_id} {label}: {e}")
+        logger.debug("Parsed %s structure: %.200s", label, parsed)
+        return []
+
+
+def _parse_prediction(result: dspy.Prediction, chunk_id: int, source: str) -> ExtractionResult:
+    """
+    Turn a raw extractor prediction into a validated ExtractionResult.
+    
+    Entities and triples are parsed independently, so a bad triples field
+    doesn't discard valid entities (and vice versa).
+    
+    Args:
+        result: Prediction with `entities` and `triples` JSON string fields.
+        chunk_id: Index of the chunk the prediction is for.
+        source: Source filename for provenance.
+        
+    Returns:
+        ExtractionResult: Parsed extraction, with an empty list for any field that fails to parse.
+    """
+    entities = _parse_list_field(result.entities, "entities", _ENTITIES_ADAPTER, chunk_id)
+    triples = _parse_list_field(
+        result.triples, "triples", _TRIPLES_ADAPTER, chunk_id, normalize=_normalize_triples
+    )
+    
+    return ExtractionResult(
+        source_file=source,
+        chunk_id=chunk_id,
+        entities=entities,
+        triples=triples
+    )
@@ -4,24 +4,63 @@ Redis storage for extracted triples.
 Stores triples as Redis Hashes for easy querying.
 """
 
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
 import redis
 
 from models import ExtractionResult
-from config import REDIS_HOST, REDIS_PORT
+from config import REDIS_HOST, REDIS_PORT, REDIS_MAX_CONNECTIONS
+
+# Shared by every client so concurrent workers each get their own socket
+_POOL = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    decode_responses=True
+)
+
+# Keys fetched or deleted per pipeline round trip
+BATCH_SIZE = 500
+
+# COUNT hint passed to SCAN so each cursor call returns more keys
+SCAN_COUNT = 1000
+
+
+def _batched(keys: Iterable[str], size: int = BATCH_SIZE) -> Iterator[list[str]]:
+    """Yield lists of up to `size` keys from an iterable."""
+    it = iter(keys)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _iter_triples(r: redis.Redis) -> Iterator[dict]:
+    """
+    Yield every stored triple with its key under "id".
+    
+    Hashes are fetched with pipelined HGETALLs, one round trip per batch of keys.
+    """
+    for keys in _batched(r.scan_iter("triple:*", count=SCAN_COUNT)):
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        
+        for key, triple in zip(keys, pipe.execute()):
+            # Key may have been deleted between SCAN and HGETALL
+            if not triple:
+                continue
+            triple["id"] = key
+            yield triple
 
 
 def get_redis_client() -> redis.Redis:
     """
-    Create and return a Redis client connection.
+    Create and return a Redis client backed by the shared connection pool.
     
     Returns:
         redis.Redis: Connected Redis client.
     """
-    client = redis.Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        decode_responses=True
-    )
+    client = redis.Redis(connection_pool=_POOL)
     
     try:
         client.ping()
@@ -38,6 +77,7 @@ def store_extraction(r: redis.Redis, extraction: ExtractionResult) -> int:
     Store extracted triples in Redis.
     
     Each triple is stored as a Redis Hash with key: triple:{source}:{chunk_id}:{index}
+    All writes are sent in a single pipeline round trip.
     
     Args:
         r: Redis client connection.
@@ -46,35 +86,125 @@ def store_extraction(r: redis.Redis, extraction: ExtractionResult) -> int:
     Returns:
         int: Number of triples stored.
     """
-    stored_count = 0
+    triple_count, _ = store_extractions(r, [extraction])
+    return triple_count
+
+
+def store_extractions(r: redis.Redis, extractions: list[ExtractionResult]) -> tuple[int, int]:
+    """
+    Store the extractions of a whole document in one pipeline round trip.
+    
+    Overlapping chunks repeat entities and triples, so only the first entity
+    per name and the first triple per (subject, predicate, object) are kept
+    for each source file.
+    
+    Args:
+        r: Redis client connection.
+        extractions: The extraction results to store.
+        
+    Returns:
+        tuple[int, int]: Number of unique triples and entities stored.
+    """
+    pipe = r.pipeline(transaction=False)
+    triple_count = entity_count = 0
+    
+    for source, (triples, entities) in _dedup_extractions(extractions).items():
+        _queue_dedup(pipe, source, triples, entities)
+        triple_count += len(triples)
+        entity_count += len(entities)
+    
+    pipe.execute()
+    return triple_count, entity_count
+
+
+def _dedup_extractions(
+    extractions: list[ExtractionResult]
+) -> dict[str, tuple[dict[tuple[str, str, str], dict], dict[str, str]]]:
+    """
+    Collect the unique triples and entities of each source file.
     
-    for i, triple in enumerate(extraction.triples):
-        # Create unique ID: source:chunk:index
-        triple_id = f"{extraction.source_file}:{extraction.chunk_id}:{i}"
+    Args:
+        extractions: The extraction results, in chunk order.
+        
+    Returns:
+        dict: Source filename -> (triples, entities). triples maps each
+        (subject, predicate, object) to its Triple.model_dump() dict plus the
+        "chunk_id" it was first seen in; entities maps each name to its type.
+    """
+    by_source = {}
+    
+    for extraction in extractions:
+        # One model -> dict conversion, then plain dict lookups below
+        dumped = extraction.model_dump()
+        triples, entities = by_source.setdefault(dumped["source_file"], ({}, {}))
+        
+        for entity in dumped["entities"]:
+            entities.setdefault(entity["name"], entity["type"])
+        
+        for triple in dumped["triples"]:
+            key = (triple["subject"]["name"], triple["predicate"], triple["object"]["name"])
+            if key not in triples:
+                triples[key] = {**triple, "chunk_id": dumped["chunk_id"]}
+    
+    return by_source
+
+
+def _queue_dedup(
+    pipe: redis.client.Pipeline,
+    source: str,
+    triples: dict[tuple[str, str, str], dict],
+    entities: dict[str, str]
+) -> None:
+    """
+    Queue the HSETs for one document's unique rows without executing them.
+    
+    Triple keys follow triple:{source}:{chunk_id}:{index}, where index counts
+    the unique triples kept for that chunk.
+    """
+    next_index = {}
+    
+    for triple in triples.values():
+        chunk_id = str(triple["chunk_id"])
+        i = next_index.get(chunk_id, 0)
+        next_index[chunk_id] = i + 1
         
-        # Store as hash
-        r.hset(f"triple:{triple_id}", mapping={
-            "subject": triple.subject.name,
-            "subject_type": triple.subject.type,
-            "predicate": triple.predicate,
-            "object": triple.object.name,
-            "object_type": triple.object.type,
-            "confidence": str(triple.confidence),
-            "source": extraction.source_file,
-            "chunk_id": str(extraction.chunk_id),
-        })
-        stored_count += 1
+        pipe.hset(f"triple:{source}:{chunk_id}:{i}", mapping=_triple_mapping(triple, source, chunk_id))
     
     # Also store entities (optional, for entity lookup)
-    for entity in extraction.entities:
-        entity_key = f"entity:{entity.name}"
-        r.hset(entity_key, mapping={
-            "name": entity.name,
-            "type": entity.type,
-            "source": extraction.source_file,
-        })
+    for name, entity_type in entities.items():
+        pipe.hset(_entity_key(source, name), mapping=_entity_mapping(name, entity_type, source))
+
+
+def _triple_mapping(triple: dict, source: str, chunk_id: str) -> dict:
+    """Build the Redis hash fields for a triple dumped from the Triple model."""
+    return {
+        "subject": triple["subject"]["name"],
+        "subject_type": triple["subject"]["type"],
+        "predicate": triple["predicate"],
+        "object": triple["object"]["name"],
+        "object_type": triple["object"]["type"],
+        "confidence": str(triple["confidence"]),
+        "source": source,
+        "chunk_id": chunk_id,
+    }
+
+
+def _entity_key(source: str, name: str) -> str:
+    """
+    Key for an entity hash: entity:{<source>}:<name>.
     
-    return stored_count
+    The {source} hash tag keeps a document's entities in one Redis Cluster slot.
+    """
+    return f"entity:{{{source}}}:{name}"
+
+
+def _entity_mapping(name: str, entity_type: str, source: str) -> dict:
+    """Build the Redis hash fields for an entity."""
+    return {
+        "name": name,
+        "type": entity_type,
+        "source": source,
+    }
 
 
 def get_all_triples(r: redis.Redis) -> list[dict]:
@@ -84,14 +214,7 @@ def get_all_triples(r: redis.Redis) -> list[dict]:
     Returns:
         list[dict]: All triples as dictionaries.
     """
-    triples = []
-    
-    for key in r.scan_iter("triple:*"):
-        triple = r.hgetall(key)
-        triple["id"] = key
-        triples.append(triple)
-    
-    return triples
+    return list(_iter_triples(r))
 
 
 def get_triples_by_subject(r: redis.Redis, subject_name: str) -> list[dict]:
@@ -100,15 +223,7 @@ def get_triples_by_subject(r: redis.Redis, subject_name: str) -> list[dict]:
     
     Note: This scans all triples. For production, use RediSearch.
     """
-    triples = []
-    
-    for key in r.scan_iter("triple:*"):
-        triple = r.hgetall(key)
-        if triple.get("subject") == subject_name:
-            triple["id"] = key
-            triples.append(triple)
-    
-    return triples
+    return [t for t in _iter_triples(r) if t.get("subject") == subject_name]
 
 
 def flush_triples(r: redis.Redis, confirm: bool = True) -> bool:
@@ -128,13 +243,10 @@ def flush_triples(r: redis.Redis, confirm: bool = True) -> bool:
             print("  Cancelled.")
             return False
     
-    # Delete all triple keys
-    for key in r.scan_iter("triple:*"):
-        r.delete(key)
-    
-    # Delete all entity keys
-    for key in r.scan_iter("entity:*"):
-        r.delete(key)
+    # Delete all triple and entity keys, UNLINK frees memory off the main thread
+    for pattern in ("triple:*", "entity:*"):
+        for keys in _batched(r.scan_iter(pattern, count=SCAN_COUNT)):
+            r.unlink(*keys)
     
     print("All triples and entities deleted.")
     return True